@@ -1,12 +1,73 @@
+import math
 import numpy as np
+from enum import IntEnum
 from functools import partial
-from scipy.stats import norm
+from numba import njit, prange
+from scipy.special import ndtr
 from scipy import optimize
 
-FWD = 'FWD'
-CALL = 'CALL'
-PUT = 'PUT'
-STRADDLE = 'STRADDLE'
+try:
+    import cupy as cp
+except ImportError:
+    cp = None
+
+class Payoff(IntEnum):
+    """European option payoff types
+
+    Members convert to their names with str, e.g. for plot titles. Payoff types given as names are
+    converted once by _to_payoff at each entry point, members do not compare equal to strings.
+    """
+    
+    FWD = 0
+    CALL = 1
+    PUT = 2
+    STRADDLE = 3
+    
+    def __str__(self):
+        return self.name
+
+FWD = Payoff.FWD
+CALL = Payoff.CALL
+PUT = Payoff.PUT
+STRADDLE = Payoff.STRADDLE
+
+def _to_payoff(pt):
+    """Converts a payoff type given as a Payoff, its value or its name in any case
+
+    Args:
+        pt (enum): Payoff type
+
+    Returns:
+        Payoff: The payoff type
+    """
+    
+    try:
+        if isinstance(pt, str):
+            return Payoff[pt.upper()]
+        return Payoff(pt)
+    except (KeyError, ValueError):
+        raise Exception('Unrecognized payoff type: ' + str(pt))
+
+_INV_SQRT_2PI = 0.3989422804014327
+_INV_SQRT_2 = 0.7071067811865476
+_MIN_VAL = 0.0000000001
+
+if cp is not None:
+    _bs_price_cuda_kernel = cp.ElementwiseKernel(
+        'T fwd, T vol, T pv, T strike, T texp, T sign',
+        'T out',
+        '''
+        const T min_val = %r;
+        const T inv_sqrt_2 = %r;
+        const T half = 0.5;
+        T s = fmax(vol, min_val) * sqrt(fmax(texp, min_val));
+        T d1 = (log(fwd / strike) + half * s * s) / s;
+        T d2 = d1 - s;
+        T nd1 = half * erfc(-sign * d1 * inv_sqrt_2);
+        T nd2 = half * erfc(-sign * d2 * inv_sqrt_2);
+        out = sign * pv * (fwd * nd1 - strike * nd2);
+        ''' % (_MIN_VAL, _INV_SQRT_2),
+        'bs_price')
 
 def option_price_interval(fwd, pv, strike, pt):
     """Calculates the European option no-arbitrage interval
@@ -21,38 +82,62 @@ def option_price_interval(fwd, pv, strike, pt):
         (float, float): Lower and upper bound of interval
     """
     
-    pt = pt.upper()
-    if pt not in [CALL, PUT]:
-        raise Exception('Unrecognized payoff type: ' + pt)
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if pt != CALL and pt != PUT:
+        raise Exception('Unrecognized payoff type: ' + pt.name)
 
-    if isinstance(fwd, (list, tuple, np.ndarray)):
-        fwd_is_list = True
-        fwd = np.asarray(fwd)
-    else:
-        fwd_is_list = False
-        
-    if isinstance(strike, (list, tuple, np.ndarray)):
-        strike_is_list = True
-        strike = np.asarray(strike)
+    if any(np.ndim(x) > 0 for x in (fwd, pv, strike)):
+        fwd, pv, strike = [np.asarray(x) if np.ndim(x) > 0 else x for x in (fwd, pv, strike)]
+        return option_price_interval_array(fwd, pv, strike, pt == CALL)
+    return option_price_interval_scalar(fwd, pv, strike, pt == CALL)
+
+def option_price_interval_scalar(fwd, pv, strike, is_call):
+    """Calculates the European option no-arbitrage interval for scalar inputs, without any checks
+
+    Args:
+        fwd (float): Forward price
+        pv (float): Discount factor
+        strike (float): Strike
+        is_call (bool): CALL if True, PUT otherwise
+
+    Returns:
+        (float, float): Lower and upper bound of interval
+    """
+    
+    pv_fwd = pv * fwd
+    pv_strike = pv * strike
+    if is_call:
+        return (max(pv_fwd - pv_strike, 0.0), pv_fwd)
     else:
-        strike_is_list = False
+        return (max(pv_strike - pv_fwd, 0.0), pv_strike)
+
+def option_price_interval_array(fwd, pv, strike, is_call):
+    """Calculates the European option no-arbitrage interval for ndarray inputs, without any checks
+
+    The upper bound is a read-only broadcast view rather than a filled copy.
+
+    Args:
+        fwd ([float]): Forward prices
+        pv ([float]): Discount factors
+        strike ([float]): Strikes
+        is_call (bool): CALL if True, PUT otherwise
+
+    Returns:
+        ([float], [float]): Lower and upper bounds of interval
+    """
     
     pv_fwd = pv * fwd
     pv_strike = pv * strike
-    if pt == CALL:
-        lb = np.maximum(pv_fwd - pv_strike, 0.0)
-        if not fwd_is_list and strike_is_list:
-            ub = np.full(strike.shape, pv_fwd)
-        else:
-            ub = pv_fwd
+    if is_call:
+        lb = np.subtract(pv_fwd, pv_strike)
+        ub = np.broadcast_to(pv_fwd, lb.shape)
     else:
-        lb = np.maximum(pv_strike - pv_fwd, 0.0)
-        if not strike_is_list and fwd_is_list:
-            ub = np.full(fwd.shape, pv_strike)
-        else:
-            ub = pv_strike
+        lb = np.subtract(pv_strike, pv_fwd)
+        ub = np.broadcast_to(pv_strike, lb.shape)
+    np.maximum(lb, 0.0, out = lb)
     
-    return (lb,ub)
+    return (lb, ub)
 
 def option_intrinsic_value(spot, strike, pt):
     """Calculates the European option intrinsic ptice
@@ -66,9 +151,10 @@ def option_intrinsic_value(spot, strike, pt):
         (float, float): Intrinsic option price
     """  
     
-    pt = pt.upper()
-    if pt not in [CALL, PUT]:
-        raise Exception('Unrecognized payoff type: ' + pt)
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if pt != CALL and pt != PUT:
+        raise Exception('Unrecognized payoff type: ' + pt.name)
     
     if isinstance(spot, (list, tuple, np.ndarray)):
         spot = np.asarray(spot)
@@ -81,6 +167,129 @@ def option_intrinsic_value(spot, strike, pt):
     else:
         return np.maximum(strike - spot, 0.0)
 
+def _float_dtype(*args):
+    """Working precision for the arguments: float32 if every numpy argument is float32, float64 otherwise
+
+    Returns:
+        type: np.float32 or np.float64
+    """
+
+    numpy_args = [x for x in args if isinstance(x, (np.ndarray, np.generic))]
+    if numpy_args and all(x.dtype == np.float32 for x in numpy_args):
+        return np.float32
+    return np.float64
+
+def _float_inputs(*args):
+    """Converts the arguments to their working precision
+
+    Lists and tuples become arrays. With float32 inputs every argument becomes a float32 array, 0-d for
+    scalars, so python scalars do not promote to float64. Other arguments are left as they are.
+
+    Returns:
+        (type, list): np.float32 or np.float64 and the converted arguments
+    """
+
+    dtype = _float_dtype(*args)
+    if dtype == np.float32:
+        return (dtype, [np.asarray(x, dtype = dtype) for x in args])
+    return (dtype, [np.asarray(x, dtype = dtype) if isinstance(x, (list, tuple)) else x for x in args])
+
+def _flat_arrays(*args, dtype = float):
+    """Broadcasts the arguments together as flat contiguous float arrays
+
+    Returns:
+        (tuple, [ndarray]): The broadcast shape and the flattened arrays
+    """
+
+    args = np.broadcast_arrays(*args)
+    return (args[0].shape, [np.ascontiguousarray(x, dtype = dtype).ravel() for x in args])
+
+@njit(fastmath = True, cache = True, error_model = 'numpy')
+def _bs_price_d1(fwd, vol, pv, strike, sqrt_texp, sign):
+    """Black Scholes price of one European CALL or PUT, shared by the compiled loops
+
+    The constants take the type of the total volatility, so float32 loops stay in single precision.
+
+    Args:
+        fwd (float): Forward price
+        vol (float): Volatility
+        pv (float): Discount factor
+        strike (float): Strike
+        sqrt_texp (float): Square root of the expiry time
+        sign (float): 1.0 for CALL, -1.0 for PUT
+
+    Returns:
+        (float, float, float): The Black Scholes option price, d1 and N(sign * d1) for the greeks
+    """
+
+    sqrtvar = vol * sqrt_texp
+    half = type(sqrtvar)(0.5)
+    inv_sqrt_2 = type(sqrtvar)(_INV_SQRT_2)
+    d1 = (math.log(fwd / strike) + half * sqrtvar * sqrtvar) / sqrtvar
+    d2 = d1 - sqrtvar
+    nd1 = half * math.erfc(-sign * d1 * inv_sqrt_2)
+    nd2 = half * math.erfc(-sign * d2 * inv_sqrt_2)
+    return (sign * pv * (fwd * nd1 - strike * nd2), d1, nd1)
+
+@njit(parallel = True, fastmath = True, cache = True)
+def _bs_price_kernel(fwd, vol, pv, strike, texp, sign):
+    """Fused Black Scholes price loop over flat arrays of equal length
+
+    float32 inputs compile to a loop that stays in single precision and packs twice as many lanes per
+    SIMD register.
+
+    Args:
+        fwd ([float]): Forward prices
+        vol ([float]): Volatilities
+        pv ([float]): Discount factors
+        strike ([float]): Strikes
+        texp ([float]): Expiry times
+        sign ([float]): 1.0 for CALL, -1.0 for PUT
+
+    Returns:
+        [float]: The Black Scholes option prices
+    """
+
+    n = strike.shape[0]
+    out = np.empty_like(strike)
+    for i in prange(n):
+        out[i] = _bs_price_d1(fwd[i], vol[i], pv[i], strike[i], math.sqrt(texp[i]), sign[i])[0]
+    return out
+
+def _bs_price_core(fwd, vol, pv, strike, sqrt_texp, pt):
+    """Black Scholes price of a European option given the square root of its expiry time
+
+    Scalar path of option_price, arrays go through the fused numba kernel.
+    The volatility is expected to be floored and pt to be CALL, PUT or STRADDLE.
+
+    Args:
+        fwd (float): Forward price
+        vol (float): Volatility
+        pv (float): Discount factor
+        strike (float): Strike
+        sqrt_texp (float): Square root of the expiry time
+        pt (enum): CALL, PUT or STRADDLE indicator
+
+    Returns:
+    float: The Black Scholes option price
+    """
+
+    sqrtvar = vol * sqrt_texp
+    d1 = (np.log(fwd/strike) + 0.5 * sqrtvar**2 ) / sqrtvar
+    d2 = d1 - sqrtvar
+    nd1 = ndtr(d1)
+    nd2 = ndtr(d2)
+    
+    c = pv * (fwd * nd1 - strike * nd2)
+    if pt == CALL:
+        return c
+    else:
+        p = c - pv * (fwd - strike)
+        if pt == PUT:
+            return p
+        else:
+            return c + p
+
 def option_price(fwd, vol, pv, strike, texp, pt):
     """Calculates the Black Scholes price of a European option
 
@@ -94,35 +303,136 @@ def option_price(fwd, vol, pv, strike, texp, pt):
 
     Returns:
     float: The Black Scholes option price
+
+    Inputs that are all float32 (python scalars aside) are priced in float32, which halves the memory
+    traffic of large scenario runs. Prices are then only good to about 1e-7 of the forward, so deep out
+    of the money wings and very low vol or short expiry prices are mostly rounding noise.
+
+    Lists and tuples are priced as arrays. Array inputs are broadcast together and copied to flat contiguous
+    arrays of the working precision once, right before the fused kernel, so strided, mixed dtype or smaller
+    inputs cost a copy. Callers wanting the best throughput should pre-stack their inputs as contiguous
+    arrays of equal shape and of a single float dtype.
     """
     
-    min_val = 0.0000000001
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    
+    dtype, (fwd, vol, pv, strike, texp) = _float_inputs(fwd, vol, pv, strike, texp)
+    
+    min_val = dtype(_MIN_VAL)
     vol = np.maximum(vol, min_val)
     texp = np.maximum(texp, min_val)
     
-    pt = pt.upper()
-    if pt not in [FWD, CALL, PUT, STRADDLE]:
-        raise Exception('Unrecognized payoff type: ' + pt)
-    
     if pt == FWD:
         return pv * (fwd - strike)
     
-    sqrtvar = vol * np.sqrt(texp)
-    d1 = (np.log(fwd/strike) + 0.5 * sqrtvar**2 ) / sqrtvar
-    d2 = d1 - sqrtvar
-    nd1 = norm.cdf(d1)
-    nd2 = norm.cdf(d2)
+    if any(isinstance(x, np.ndarray) for x in (fwd, vol, pv, strike, texp)):
+        shape, (fwd, vol, pv, strike, texp) = _flat_arrays(fwd, vol, pv, strike, texp, dtype = dtype)
+        sign = np.full_like(strike, -1.0 if pt == PUT else 1.0)
+        v = _bs_price_kernel(fwd, vol, pv, strike, texp, sign)
+        if pt == STRADDLE:
+            v = 2.0 * v - pv * (fwd - strike)
+        return v.reshape(shape)
     
-    c = pv * (fwd * nd1 - strike * nd2)
-    if pt == CALL:
-        return c
-    else:
-        p = c - pv * (fwd - strike)
-        if pt == PUT:
-            return c - pv * (fwd - strike)
-        else:
-            return c + p
+    return _bs_price_core(fwd, vol, pv, strike, np.sqrt(texp), pt)
       
+@njit(parallel = True, fastmath = True, cache = True)
+def _bs_fixed_expiry_kernel(fwd, vol, pv, strike, sqrt_texp, sign):
+    """_bs_price_kernel for a single expiry and payoff sign, both loop invariant scalars
+
+    Args:
+        fwd ([float]): Forward prices
+        vol ([float]): Volatilities
+        pv ([float]): Discount factors
+        strike ([float]): Strikes
+        sqrt_texp (float): Square root of the expiry time
+        sign (float): 1.0 for CALL, -1.0 for PUT
+
+    Returns:
+        [float]: The Black Scholes option prices
+    """
+
+    n = strike.shape[0]
+    out = np.empty_like(strike)
+    for i in prange(n):
+        out[i] = _bs_price_d1(fwd[i], vol[i], pv[i], strike[i], sqrt_texp, sign)[0]
+    return out
+
+def make_pricer(texp, pt):
+    """Builds a Black Scholes pricer specialised for one expiry and payoff type
+
+    The payoff check, sqrt(texp), the sign and the STRADDLE branch are resolved once here, so
+    calibration loops pricing repeatedly on one expiry only pay for the strike dependent work.
+
+    Args:
+        texp (float): Expiry time, a scalar. Use option_price for arrays of expiry times
+        pt (enum): CALL, PUT, STRADDLE or FWD indicator
+
+    Returns:
+        pricer: Function of (fwd, vol, pv, strike) returning the Black Scholes option prices
+    """
+
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if np.ndim(texp) != 0:
+        raise Exception('make_pricer needs a scalar expiry time')
+    
+    if pt == FWD:
+        def forward_pricer(fwd, vol, pv, strike):
+            _, (fwd, pv, strike) = _float_inputs(fwd, pv, strike)
+            return pv * (fwd - strike)
+        return forward_pricer
+    
+    sqrt_texp = math.sqrt(max(texp, _MIN_VAL))
+    sign = -1.0 if pt == PUT else 1.0
+    straddle = pt == STRADDLE
+    
+    def pricer(fwd, vol, pv, strike):
+        dtype, (fwd, vol, pv, strike) = _float_inputs(fwd, vol, pv, strike)
+        vol = np.maximum(vol, dtype(_MIN_VAL))
+        if not any(isinstance(x, np.ndarray) for x in (fwd, vol, pv, strike)):
+            return _bs_price_core(fwd, vol, pv, strike, sqrt_texp, pt)
+        
+        shape, (fwd, vol, pv, strike) = _flat_arrays(fwd, vol, pv, strike, dtype = dtype)
+        v = _bs_fixed_expiry_kernel(fwd, vol, pv, strike, dtype(sqrt_texp), dtype(sign))
+        if straddle:
+            v = 2.0 * v - pv * (fwd - strike)
+        return v.reshape(shape)
+    
+    return pricer
+
+def option_price_cuda(fwd, vol, pv, strike, texp, pt):
+    """Calculates the Black Scholes price of European options on the GPU with CuPy
+
+    One fused elementwise kernel computes d1, d2, the normal cdf and the price, so nothing but the
+    output is written to device memory. Inputs broadcast like CuPy arrays and must share one float dtype,
+    which the kernel computes in. option_price does not dispatch here: GPU pricing is opt in.
+
+    Args:
+        fwd (cupy.ndarray): Forward prices
+        vol (cupy.ndarray): Volatilities
+        pv (cupy.ndarray): Discount factors
+        strike (cupy.ndarray): Strikes
+        texp (cupy.ndarray): Expiry times
+        pt (enum): CALL, PUT, STRADDLE or FWD indicator
+
+    Returns:
+        cupy.ndarray: The Black Scholes option prices
+    """
+
+    if cp is None:
+        raise Exception('CuPy is required for GPU pricing')
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    
+    if pt == FWD:
+        return pv * (fwd - strike)
+    sign = cp.asarray(-1.0 if pt == PUT else 1.0, dtype = cp.result_type(fwd, vol, pv, strike, texp))
+    v = _bs_price_cuda_kernel(fwd, vol, pv, strike, texp, sign)
+    if pt == STRADDLE:
+        v = 2.0 * v - pv * (fwd - strike)
+    return v
+
 def option_vol(price, fwd, pv, strike, texp, pt, min_vol = 0.0, max_vol = 20.0):
     """Implies the Black Scholes volatility for a given price for a European option
 
@@ -146,11 +456,234 @@ def option_vol(price, fwd, pv, strike, texp, pt, min_vol = 0.0, max_vol = 20.0):
         return y
     
     try: 
-        vol = optimize.bisect(partial(target, t = price), min_vol, max_vol)
+        vol = _newton_vol(price, fwd, pv, strike, texp, pt, min_vol, max_vol)
+        if np.isnan(vol):
+            vol = optimize.brentq(partial(target, t = price), min_vol, max_vol)
     except:
         vol = np.nan
     return vol
-  
+
+def _bs_price_vega(fwd, vol, pv, strike, texp, pt):
+    """Black Scholes price and vega of a European option from a single d1/d2 evaluation
+
+    Args:
+        fwd (float): Forward price
+        vol (float): Volatility
+        pv (float): Discount factor
+        strike (float): Strike
+        texp (float): Expiry time
+        pt (enum): CALL, PUT or STRADDLE indicator
+
+    Returns:
+        (float, float): The Black Scholes option price and vega
+    """
+
+    sqrt_texp = math.sqrt(max(texp, _MIN_VAL))
+    price, d1, _ = _bs_price_d1(float(fwd), max(float(vol), _MIN_VAL), float(pv), float(strike), sqrt_texp, -1.0 if pt == PUT else 1.0)
+    vega = pv * fwd * _INV_SQRT_2PI * math.exp(-0.5 * d1 * d1) * sqrt_texp
+    if pt == STRADDLE:
+        return 2.0 * price - pv * (fwd - strike), 2.0 * vega
+    return price, vega
+
+def _newton_vol(price, fwd, pv, strike, texp, pt, min_vol, max_vol, xtol = 2e-12, maxiter = 8):
+    """Newton-Raphson on vega for the Black Scholes implied volatility
+
+    Starts from the Brenner-Subrahmanyam ATM approximation.
+
+    Returns:
+        float: The implied volatility, nan if the iterations leave [min_vol, max_vol] or do not converge
+    """
+
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if pt == FWD:
+        return np.nan
+    
+    legs = 2.0 if pt == STRADDLE else 1.0
+    vol = math.sqrt(2.0 * math.pi / max(texp, _MIN_VAL)) * price / (legs * pv * fwd)
+    vol = min(max(vol, min_vol), max_vol)
+    for _ in range(maxiter):
+        c, vega = _bs_price_vega(fwd, vol, pv, strike, texp, pt)
+        diff = c - price
+        if diff == 0.0:
+            return vol
+        if not abs(diff) < vega * (max_vol - min_vol):
+            return np.nan
+        step = diff / vega
+        vol -= step
+        if vol < min_vol or vol > max_vol:
+            return np.nan
+        if abs(step) < xtol:
+            return vol
+    return np.nan
+
+def option_vol_vec(prices, fwds, pvs, strikes, texps, pt, min_vol = 0.0, max_vol = 20.0, xtol = 2e-12, maxiter = 50):
+    """Implies the Black Scholes volatilities for arrays of European option prices
+
+    All the root finds advance in lockstep with Chandrupatla's algorithm, so each
+    iteration is a single vectorized option_price call on the brackets still alive.
+
+    Args:
+        prices ([float]): Option prices
+        fwds ([float]): Forward prices
+        pvs ([float]): Discount factors
+        strikes ([float]): Strikes
+        texps ([float]): Expiry times
+        pt (enum): CALL, PUT or STRADDLE indicator
+        min_vol (float): Lower bound of implied volatility
+        max_vol (float): Upper bound of implied volatility
+        xtol (float): Absolute tolerance on the implied volatility
+        maxiter (int): Maximum number of iterations
+
+    Returns:
+        [float]: The Black Scholes implied volatilities, nan where the price is not bracketed
+    """
+
+    pricer = make_pricer(texps, pt) if np.ndim(texps) == 0 else None
+    prices, fwds, pvs, strikes, texps = np.broadcast_arrays(prices, fwds, pvs, strikes, texps)
+    shape = prices.shape
+    prices, fwds, pvs, strikes, texps = [np.array(x, dtype = float).ravel() for x in (prices, fwds, pvs, strikes, texps)]
+
+    def target(v, idx):
+        if pricer is not None:
+            return pricer(fwds[idx], v, pvs[idx], strikes[idx]) - prices[idx]
+        return option_price(fwds[idx], v, pvs[idx], strikes[idx], texps[idx], pt) - prices[idx]
+
+    n = prices.size
+    alive = np.arange(n)
+    b = np.full(n, float(min_vol))
+    a = np.full(n, float(max_vol))
+    fb = target(b, alive)
+    fa = target(a, alive)
+    c = a.copy()
+    fc = fa.copy()
+    vols = np.full(n, np.nan)
+
+    bracketed = np.sign(fa) * np.sign(fb) <= 0.0
+    alive = alive[bracketed]
+    a, b, c, fa, fb, fc = a[bracketed], b[bracketed], c[bracketed], fa[bracketed], fb[bracketed], fc[bracketed]
+    t = np.full(alive.size, 0.5)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        for _ in range(maxiter):
+            if alive.size == 0:
+                break
+
+            xt = a + t * (b - a)
+            ft = target(xt, alive)
+
+            same = np.sign(ft) == np.sign(fa)
+            c, fc, b, fb = np.where(same, a, b), np.where(same, fa, fb), np.where(same, b, a), np.where(same, fb, fa)
+            a, fa = xt, ft
+
+            use_a = np.abs(fa) < np.abs(fb)
+            xm = np.where(use_a, a, b)
+            fm = np.where(use_a, fa, fb)
+            tol = 2.0 * np.finfo(float).eps * np.abs(xm) + xtol
+            tlim = tol / np.abs(b - c)
+
+            done = (fm == 0.0) | (tlim > 0.5)
+            vols[alive[done]] = xm[done]
+
+            live = ~done
+            alive, a, b, c, fa, fb, fc, tlim = alive[live], a[live], b[live], c[live], fa[live], fb[live], fc[live], tlim[live]
+
+            xi = (a - b) / (c - b)
+            phi = (fa - fb) / (fc - fb)
+            iqi = (phi**2 < xi) & ((1.0 - phi)**2 < 1.0 - xi)
+            t_iqi = fa / (fb - fa) * fc / (fb - fc) + (c - a) / (b - a) * fa / (fc - fa) * fb / (fc - fb)
+            t = np.where(iqi, t_iqi, 0.5)
+            t = np.minimum(1.0 - tlim, np.maximum(tlim, t))
+
+        vols[alive] = np.where(np.abs(fa) < np.abs(fb), a, b)
+
+    return vols.reshape(shape)
+
+@njit(parallel = True, cache = True)
+def _newton_vol_kernel(prices, fwd, pv, strike, texp, sign, min_vol, max_vol, xtol, maxiter):
+    """Per quote Newton-Raphson on vega over flat arrays of equal length, as in _newton_vol
+
+    Args:
+        prices ([float]): Option prices
+        fwd ([float]): Forward prices
+        pv ([float]): Discount factors
+        strike ([float]): Strikes
+        texp ([float]): Expiry times
+        sign (float): 1.0 for CALL, -1.0 for PUT
+        min_vol (float): Lower bound of implied volatility
+        max_vol (float): Upper bound of implied volatility
+        xtol (float): Absolute tolerance on the implied volatility
+        maxiter (int): Maximum number of iterations
+
+    Returns:
+        [float]: The implied volatilities, nan where Newton did not converge inside the bounds
+    """
+
+    n = prices.shape[0]
+    vols = np.full(n, np.nan)
+    for i in prange(n):
+        f = fwd[i]
+        k = strike[i]
+        sqrt_texp = math.sqrt(max(texp[i], _MIN_VAL))
+        vol = math.sqrt(2.0 * math.pi) / sqrt_texp * prices[i] / (pv[i] * f)
+        vol = min(max(vol, min_vol), max_vol)
+        for _ in range(maxiter):
+            price, d1, _ = _bs_price_d1(f, max(vol, _MIN_VAL), pv[i], k, sqrt_texp, sign)
+            vega = pv[i] * f * _INV_SQRT_2PI * math.exp(-0.5 * d1 * d1) * sqrt_texp
+            diff = price - prices[i]
+            if diff == 0.0:
+                vols[i] = vol
+                break
+            if not abs(diff) < vega * (max_vol - min_vol):
+                break
+            step = diff / vega
+            vol -= step
+            if vol < min_vol or vol > max_vol:
+                break
+            if abs(step) < xtol:
+                vols[i] = vol
+                break
+    return vols
+
+def option_vol_array(prices, fwd, pv, strikes, texp, pt, min_vol = 0.0, max_vol = 20.0):
+    """Implies the Black Scholes volatilities for arrays of European option prices
+
+    CALL and PUT quotes run a compiled Newton-Raphson per quote, and the few that do not converge
+    are retried with the bracketed option_vol_vec, which also handles STRADDLE. Non array inputs
+    go to option_vol.
+
+    Args:
+        prices ([float]): Option prices
+        fwd ([float]): Forward prices
+        pv ([float]): Discount factors
+        strikes ([float]): Strikes
+        texp ([float]): Expiry times
+        pt (enum): CALL, PUT or STRADDLE indicator
+        min_vol (float): Lower bound of implied volatility
+        max_vol (float): Upper bound of implied volatility
+
+    Returns:
+        [float]: The Black Scholes implied volatilities, nan where the price is not bracketed
+    """
+
+    if not any(isinstance(x, (list, tuple, np.ndarray)) for x in (prices, fwd, pv, strikes, texp)):
+        return option_vol(prices, fwd, pv, strikes, texp, pt, min_vol, max_vol)
+    
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if pt != CALL and pt != PUT:
+        return option_vol_vec(prices, fwd, pv, strikes, texp, pt, min_vol, max_vol)
+    
+    fixed_texp = texp if np.ndim(texp) == 0 else None
+    shape, (prices, fwd, pv, strikes, texp) = _flat_arrays(prices, fwd, pv, strikes, texp)
+    vols = _newton_vol_kernel(prices, fwd, pv, strikes, texp, 1.0 if pt == CALL else -1.0, float(min_vol), float(max_vol), 2e-12, 8)
+    
+    retry = np.isnan(vols)
+    if retry.any():
+        texp_retry = texp[retry] if fixed_texp is None else fixed_texp
+        vols[retry] = option_vol_vec(prices[retry], fwd[retry], pv[retry], strikes[retry], texp_retry, pt, min_vol, max_vol)
+    return vols.reshape(shape)
+
 def option_risk(spot, vol, rate, strike, texp, pt):
     """Calculates the Black Scholes price and greeks of a European option
 
@@ -164,15 +697,22 @@ def option_risk(spot, vol, rate, strike, texp, pt):
 
     Returns:
     dict: The Black Scholes option price and greeks in a dictionary with labels 'Price', 'Delta', 'Gamma', 'Vega'
+
+    As for option_price, inputs that are all float32 are computed in float32.
     """
     
-    min_val = 0.0000000001
+    dtype = _float_dtype(spot, vol, rate, strike, texp)
+    if dtype == np.float32:
+        spot, vol, rate, strike, texp = [np.asarray(x, dtype = dtype) for x in (spot, vol, rate, strike, texp)]
+    
+    min_val = dtype(_MIN_VAL)
     vol = np.maximum(vol, min_val)
     texp = np.maximum(texp, min_val)
     
-    pt = pt.upper()
-    if pt not in [CALL, PUT]:
-        raise Exception('Unrecognized payoff type: ' + pt)
+    if not isinstance(pt, Payoff):
+        pt = _to_payoff(pt)
+    if pt != CALL and pt != PUT:
+        raise Exception('Unrecognized payoff type: ' + pt.name)
 
     pv = np.exp(-rate * texp)
     fwd = spot / pv
@@ -180,8 +720,8 @@ def option_risk(spot, vol, rate, strike, texp, pt):
     sqrtvar = vol * np.sqrt(texp)
     d1 = (np.log(fwd/strike) + 0.5 * sqrtvar**2 ) / sqrtvar
     d2 = d1 - sqrtvar
-    Nd1 = norm.cdf(d1)
-    Nd2 = norm.cdf(d2)
+    Nd1 = ndtr(d1)
+    Nd2 = ndtr(d2)
     
     c = pv * (fwd * Nd1 - strike * Nd2)
     if pt == CALL:
@@ -191,7 +731,7 @@ def option_risk(spot, vol, rate, strike, texp, pt):
         price = c - pv * (fwd - strike)
         delta = Nd1 - 1.0
 
-    nd1 = norm.pdf(d1)
+    nd1 = _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
     gamma = nd1 / (spot * sqrtvar)
     vega = spot * nd1 * np.sqrt(texp)
     
@@ -202,4 +742,131 @@ def option_risk(spot, vol, rate, strike, texp, pt):
         'Vega': vega
     }
     
-    return results
\ No newline at end of file
+    return results
+
+@njit(parallel = True, fastmath = True, cache = True)
+def _bs_risk_kernel(fwd, vol, pv, strike, texp, sign):
+    """Fused Black Scholes price and greeks loop over flat arrays of equal length, as in option_risk
+
+    Args:
+        fwd ([float]): Forward prices
+        vol ([float]): Volatilities
+        pv ([float]): Discount factors
+        strike ([float]): Strikes
+        texp ([float]): Expiry times
+        sign ([float]): 1.0 for CALL, -1.0 for PUT
+
+    Returns:
+        ([float], [float], [float], [float]): The Black Scholes option prices, deltas, gammas and vegas
+    """
+
+    n = strike.shape[0]
+    price = np.empty_like(strike)
+    delta = np.empty_like(strike)
+    gamma = np.empty_like(strike)
+    vega = np.empty_like(strike)
+    for i in prange(n):
+        sqrt_texp = math.sqrt(texp[i])
+        price[i], d1, nd1 = _bs_price_d1(fwd[i], vol[i], pv[i], strike[i], sqrt_texp, sign[i])
+        delta[i] = sign[i] * nd1
+        spot = pv[i] * fwd[i]
+        pdf = _INV_SQRT_2PI * math.exp(-0.5 * d1 * d1)
+        gamma[i] = pdf / (spot * vol[i] * sqrt_texp)
+        vega[i] = spot * pdf * sqrt_texp
+    return price, delta, gamma, vega
+
+class OptionBook:
+    """Book of European CALL and PUT options stored as parallel contiguous arrays
+    """
+    
+    __slots__ = ('fwd', 'strike', 'texp', 'is_call', 'pv', 'sign')
+    
+    def __init__(self, fwd, pv, strike, texp, is_call):
+        """Constructor
+
+        Args:
+            fwd ([float]): Forward prices
+            pv ([float]): Discount factors
+            strike ([float]): Strikes
+            texp ([float]): Expiry times
+            is_call ([bool]): CALL if True, PUT otherwise
+        """
+        
+        shape = np.broadcast_shapes(*[np.shape(x) for x in (fwd, pv, strike, texp, is_call)])
+        flat = [np.ascontiguousarray(np.broadcast_to(x, shape), dtype = float).ravel() for x in (fwd, pv, strike, texp)]
+        self.fwd, self.pv, self.strike, self.texp = flat
+        self.texp = np.maximum(self.texp, _MIN_VAL)
+        self.is_call = np.ascontiguousarray(np.broadcast_to(is_call, shape), dtype = np.bool_).ravel()
+        self.sign = np.where(self.is_call, 1.0, -1.0)
+        
+        return
+    
+    def __len__(self):
+        """Number of options in the book"""
+        return self.strike.shape[0]
+    
+    def _vols(self, vol):
+        """Floored volatilities broadcast to the book"""
+        return np.ascontiguousarray(np.broadcast_to(np.maximum(vol, _MIN_VAL), self.strike.shape), dtype = float)
+    
+    def prices(self, vol):
+        """Black Scholes prices of the book
+
+        Args:
+            vol ([float]): Volatility, or one volatility per option
+
+        Returns:
+            [float]: The Black Scholes option prices
+        """
+        
+        return _bs_price_kernel(self.fwd, self._vols(vol), self.pv, self.strike, self.texp, self.sign)
+    
+    def risk(self, vol):
+        """Black Scholes prices and greeks of the book
+
+        Args:
+            vol ([float]): Volatility, or one volatility per option
+
+        Returns:
+            dict: The Black Scholes option prices and greeks in a dictionary with labels 'Price', 'Delta', 'Gamma', 'Vega'
+        """
+        
+        price, delta, gamma, vega = _bs_risk_kernel(self.fwd, self._vols(vol), self.pv, self.strike, self.texp, self.sign)
+        results = {
+            'Price': price,
+            'Delta': delta,
+            'Gamma': gamma,
+            'Vega': vega
+        }
+        
+        return results
+    
+    def vega(self, vol):
+        """Black Scholes vegas of the book
+
+        Args:
+            vol ([float]): Volatility, or one volatility per option
+
+        Returns:
+            [float]: The Black Scholes option vegas
+        """
+        
+        return self.risk(vol)['Vega']
+    
+    def implied_vols(self, prices, min_vol = 0.0, max_vol = 20.0):
+        """Implies the Black Scholes volatilities of the book
+
+        Args:
+            prices ([float]): One option price per option
+            min_vol (float): Lower bound of implied volatility
+            max_vol (float): Upper bound of implied volatility
+
+        Returns:
+            [float]: The Black Scholes implied volatilities
+        """
+        
+        prices = np.broadcast_to(np.asarray(prices, dtype = float), self.strike.shape)
+        vols = np.empty(self.strike.shape)
+        for pt, mask in ((CALL, self.is_call), (PUT, ~self.is_call)):
+            vols[mask] = option_vol_array(prices[mask], self.fwd[mask], self.pv[mask], self.strike[mask], self.texp[mask], pt, min_vol, max_vol)
+        return vols
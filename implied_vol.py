@@ -1,17 +1,33 @@
+import math
 import numpy as np
+from numba import njit, prange
+from scipy.special import ndtr
 import black_scholes as bs
 
-def build_tanh_prop_moneyness(w, PV):
-    """TANH proportional moneyness factory
+_QUAD_MONEYNESS = 0
+_TANH_MONEYNESS = 1
 
-    Args:
-        w (float): Cutoff velocity parameter
-        PV (float): Discount Factor
+class TanhMoneyness:
+    """TANH proportional moneyness functor
+    """
+    
+    __slots__ = ('w', 'inv_w', 'inv_PV')
+    
+    def __init__(self, w, PV):
+        """Constructor
 
-    Returns:
-        moneyness: TANH proportional moneyness functor
-    """   
-    def moneyness(K, KRef):
+        Args:
+            w (float): Cutoff velocity parameter
+            PV (float): Discount Factor
+        """
+        
+        self.w = w
+        self.inv_w = 1.0 / w
+        self.inv_PV = 1.0 / PV
+        
+        return
+    
+    def __call__(self, K, KRef):
         """TANH proportional moneyness
 
         Args:
@@ -22,24 +38,58 @@ def build_tanh_prop_moneyness(w, PV):
             float: TANH proportional Moneyness
         """           
         
-        fwd_ref = KRef / PV
-        pm = (K - fwd_ref) / fwd_ref
-        m = w * np.tanh(pm / w)
+        pm = K * (1.0 / (KRef * self.inv_PV)) - 1.0
+        m = self.w * np.tanh(pm * self.inv_w)
         return m
     
-    return moneyness
+    def call(self, K, KRef):
+        """TANH proportional moneyness over an array of strikes
+
+        Args:
+            K ([float]): Strikes
+            KRef (float): Strike Reference
+
+        Returns:
+            [float]: TANH proportional Moneyness
+        """
+        
+        return self(np.asarray(K, dtype = float), KRef)
     
-def build_quad_prop_moneyness(PV):
-    """Quadratic proportional moneyness factory
+    def derivatives(self, K, KRef):
+        """TANH proportional moneyness and its first two strike derivatives
 
-    Args:
-        PV (float): Discount Factor
+        Args:
+            K (float): Strike
+            KRef (float): Strike Reference
 
-    Returns:
-        moneyness: quadratic proportional moneyness functor
-    """   
+        Returns:
+            (float, float, float): Moneyness, dm/dK and d2m/dK2
+        """
+        
+        scale = 1.0 / (KRef * self.inv_PV)
+        u = np.tanh((K * scale - 1.0) * self.inv_w)
+        dm = (1.0 - u * u) * scale
+        d2m = -2.0 * u * dm * scale * self.inv_w
+        return self.w * u, dm, d2m
+
+class QuadMoneyness:
+    """Quadratic proportional moneyness functor
+    """
+    
+    __slots__ = ('inv_PV',)
+    
+    def __init__(self, PV):
+        """Constructor
+
+        Args:
+            PV (float): Discount Factor
+        """
+        
+        self.inv_PV = 1.0 / PV
+        
+        return
     
-    def moneyness(K, KRef):
+    def __call__(self, K, KRef):
         """Quadratic proportional moneyness
 
         Args:
@@ -49,12 +99,63 @@ def build_quad_prop_moneyness(PV):
         Returns:
             float: Quadratic proportional Moneyness
         """                  
-        fwd_ref = KRef / PV
-        pm = (K - fwd_ref) / fwd_ref
+        
+        pm = K * (1.0 / (KRef * self.inv_PV)) - 1.0
         m = pm
         return m
+    
+    def call(self, K, KRef):
+        """Quadratic proportional moneyness over an array of strikes
+
+        Args:
+            K ([float]): Strikes
+            KRef (float): Strike Reference
+
+        Returns:
+            [float]: Quadratic proportional Moneyness
+        """
+        
+        return self(np.asarray(K, dtype = float), KRef)
+    
+    def derivatives(self, K, KRef):
+        """Quadratic proportional moneyness and its first two strike derivatives
+
+        Args:
+            K (float): Strike
+            KRef (float): Strike Reference
+
+        Returns:
+            (float, float, float): Moneyness, dm/dK and d2m/dK2
+        """
         
-    return moneyness
+        scale = 1.0 / (KRef * self.inv_PV)
+        m = self(K, KRef)
+        return m, np.full_like(m, scale), np.zeros_like(m)
+
+def build_tanh_prop_moneyness(w, PV):
+    """TANH proportional moneyness factory
+
+    Args:
+        w (float): Cutoff velocity parameter
+        PV (float): Discount Factor
+
+    Returns:
+        moneyness: TANH proportional moneyness functor
+    """   
+    
+    return TanhMoneyness(w, PV)
+    
+def build_quad_prop_moneyness(PV):
+    """Quadratic proportional moneyness factory
+
+    Args:
+        PV (float): Discount Factor
+
+    Returns:
+        moneyness: quadratic proportional moneyness functor
+    """   
+    
+    return QuadMoneyness(PV)
   
 class IV_Quad_F:
     """Implied Volatility model as a quadratic of generalised moneyness
@@ -102,6 +203,95 @@ class IV_Quad_F:
         m = self.f(K, self.KRef)
         y = self.a + self.b * m + 0.5 * self.c * m**2
         return y
+    
+    def implied_vol_and_dK(self, K, T):
+        """Implied Volatility and its strike derivatives for requested strike and maturity
+
+        Requires a moneyness functor exposing derivatives, such as TanhMoneyness or QuadMoneyness.
+
+        Args:
+            K (float): Strike
+            T (float): Expiry
+
+        Returns:
+            (float, float, float): The implied volatility, dvol/dK and d2vol/dK2
+        """
+        
+        m, dm, d2m = self.f.derivatives(K, self.KRef)
+        slope = self.b + self.c * m
+        y = self.a + self.b * m + 0.5 * self.c * m**2
+        return y, slope * dm, self.c * dm**2 + slope * d2m
+    
+    def get_kernel_params(self):
+        """Parameters of the smile for the fused implied distribution kernel
+
+        Returns:
+            (float, float, float, float, float, float, int): a, b, c, KRef, moneyness 1/PV, moneyness w and
+            moneyness kind, or None if the moneyness functor is neither TanhMoneyness nor QuadMoneyness
+        """
+        
+        if type(self.f) is TanhMoneyness:
+            return (self.a, self.b, self.c, self.KRef, self.f.inv_PV, self.f.w, _TANH_MONEYNESS)
+        if type(self.f) is QuadMoneyness:
+            return (self.a, self.b, self.c, self.KRef, self.f.inv_PV, 1.0, _QUAD_MONEYNESS)
+        return None
+
+@njit(fastmath = True, cache = True, error_model = 'numpy')
+def _smile_vol(K, a, b, c, inv_fwd_ref, w, moneyness_kind):
+    """Scalar IV_Quad_F implied volatility for the fused kernel"""
+    
+    m = K * inv_fwd_ref - 1.0
+    if moneyness_kind == _TANH_MONEYNESS:
+        m = w * math.tanh(m / w)
+    return a + b * m + 0.5 * c * m * m
+
+@njit(fastmath = True, cache = True, error_model = 'numpy')
+def _undiscounted_put(fwd, vol, K, sqrt_T):
+    """Scalar Black Scholes put price with unit discount factor for the fused kernel"""
+    
+    return bs._bs_price_d1(fwd, max(vol, bs._MIN_VAL), 1.0, K, sqrt_T, -1.0)[0]
+
+@njit(parallel = True, fastmath = True, cache = True, error_model = 'numpy')
+def _implied_dist_kernel(strikes, T, fwd, eps, a, b, c, KRef, inv_PV, w, moneyness_kind):
+    """Fused three point stencil of implied_distribution for an IV_Quad_F smile
+
+    Args:
+        strikes ([float]): Strikes
+        T (float): Expiry
+        fwd (float): Forward price
+        eps (float): Relative strike bump of the stencil
+        a (float): ATM Vol
+        b (float): Slope around ATM f'(0)
+        c (float): Convexity around ATM f''(0)
+        KRef (float): Strike Reference
+        inv_PV (float): Inverse of the discount factor of the moneyness
+        w (float): Cutoff velocity parameter of the moneyness
+        moneyness_kind (int): _QUAD_MONEYNESS or _TANH_MONEYNESS
+
+    Returns:
+        ([float], [float], [float], [float]): The calculated implied volatility, option price, implied distribution, implied density
+    """
+    
+    n = strikes.shape[0]
+    vols = np.empty(n)
+    v = np.empty(n)
+    dist = np.empty(n)
+    dens = np.empty(n)
+    inv_fwd_ref = 1.0 / (KRef * inv_PV)
+    sqrt_T = math.sqrt(max(T, bs._MIN_VAL))
+    for i in prange(n):
+        k = strikes[i]
+        k_up = k * (1.0 + eps)
+        k_dn = k * (1.0 - eps)
+        vol = _smile_vol(k, a, b, c, inv_fwd_ref, w, moneyness_kind)
+        p = _undiscounted_put(fwd, vol, k, sqrt_T)
+        p_up = _undiscounted_put(fwd, _smile_vol(k_up, a, b, c, inv_fwd_ref, w, moneyness_kind), k_up, sqrt_T)
+        p_dn = _undiscounted_put(fwd, _smile_vol(k_dn, a, b, c, inv_fwd_ref, w, moneyness_kind), k_dn, sqrt_T)
+        vols[i] = vol
+        v[i] = p
+        dist[i] = (p_up - p_dn) / (k_up - k_dn)
+        dens[i] = (p_up - 2.0 * p + p_dn) / ((k_up - k) * (k - k_dn))
+    return vols, v, dist, dens
       
 def implied_distribution(strikes, T, spot, PV, IVCalc):
     """Calculates implied quantities from the volatility smile for requested strikes on a given maturity
@@ -120,18 +310,82 @@ def implied_distribution(strikes, T, spot, PV, IVCalc):
     epsilon = 0.0001 * IVCalc.get_strike_ref()
     fwd = spot / PV
     
+    kernel_params = None
+    if np.ndim(T) == 0 and type(IVCalc).implied_vol is IV_Quad_F.implied_vol:
+        kernel_params = IVCalc.get_kernel_params()
+    if kernel_params is not None:
+        strikes = np.asarray(strikes, dtype = float)
+        results = _implied_dist_kernel(np.ascontiguousarray(strikes).ravel(), T, fwd, epsilon, *kernel_params)
+        if strikes.ndim == 0:
+            return tuple(x[0] for x in results)
+        return tuple(x.reshape(strikes.shape) for x in results)
+    
+    if np.ndim(T) == 0:
+        put_price = bs.make_pricer(T, bs.PUT)
+    else:
+        put_price = lambda fwd, vol, pv, strike: bs.option_price(fwd, vol, pv, strike, T, bs.PUT)
+    
     strikes_up = strikes * (1.0 + epsilon)
     vols_up = IVCalc.implied_vol(strikes_up, T)
-    v_up = bs.option_price(fwd, vols_up, 1.0, strikes_up, T, bs.PUT)
+    v_up = put_price(fwd, vols_up, 1.0, strikes_up)
     
     vols = IVCalc.implied_vol(strikes, T)
-    v = bs.option_price(fwd, vols, 1.0, strikes, T, bs.PUT)
+    v = put_price(fwd, vols, 1.0, strikes)
 
     strikes_dn = strikes * (1.0 - epsilon)
     vols_dn = IVCalc.implied_vol(strikes_dn, T)
-    v_dn = bs.option_price(fwd, vols_dn, 1.0, strikes_dn, T, bs.PUT)
+    v_dn = put_price(fwd, vols_dn, 1.0, strikes_dn)
     
     dist = (v_up - v_dn) / (strikes_up - strikes_dn)
     dens = (v_up - 2.0 * v + v_dn) / ((strikes_up - strikes)*(strikes - strikes_dn))
     
-    return vols, v, dist, dens
\ No newline at end of file
+    return vols, v, dist, dens
+
+def implied_distribution_analytic(strikes, T, spot, PV, IVCalc):
+    """Calculates implied quantities from the volatility smile with closed form strike derivatives
+
+    Differentiates the Black Scholes put price along the smile (Breeden Litzenberger) instead of
+    bumping strikes, so there is no finite difference error and ndtr is only called twice per strike.
+    Falls back to implied_distribution if IVCalc does not expose implied_vol_and_dK, or overrides
+    implied_vol without overriding implied_vol_and_dK.
+
+    Args:
+        strikes ([float]): Strikes
+        T (float): Expiry
+        spot (float): Spot price
+        PV (float): Discount factor
+        IVCalc (object): Implied volatility calculator
+
+    Returns:
+        ([float], [float], [float], [float]): The calculated implied volatility, option price, implied distribution, implied density
+    """
+    
+    if not hasattr(IVCalc, 'implied_vol_and_dK') or not hasattr(getattr(IVCalc, 'f', None), 'derivatives'):
+        return implied_distribution(strikes, T, spot, PV, IVCalc)
+    calc_type = type(IVCalc)
+    if calc_type.implied_vol_and_dK is IV_Quad_F.implied_vol_and_dK and calc_type.implied_vol is not IV_Quad_F.implied_vol:
+        return implied_distribution(strikes, T, spot, PV, IVCalc)
+    
+    fwd = spot / PV
+    strikes = np.asarray(strikes, dtype = float)
+    vols, dvol, d2vol = IVCalc.implied_vol_and_dK(strikes, T)
+    
+    vol = np.maximum(vols, bs._MIN_VAL)
+    sqrt_T = np.sqrt(np.maximum(T, bs._MIN_VAL))
+    sqrtvar = vol * sqrt_T
+    d1 = (np.log(fwd/strikes) + 0.5 * sqrtvar**2 ) / sqrtvar
+    d2 = d1 - sqrtvar
+    n_d2 = ndtr(-d2)
+    v = strikes * n_d2 - fwd * ndtr(-d1)
+    
+    pdf_d2 = bs._INV_SQRT_2PI * np.exp(-0.5 * d2 * d2)
+    vega = strikes * pdf_d2 * sqrt_T
+    vanna = pdf_d2 * d1 / vol
+    volga = vega * d1 * d2 / vol
+    
+    dist = n_d2 + vega * dvol
+    dens = pdf_d2 / (strikes * sqrtvar) + 2.0 * vanna * dvol + volga * dvol**2 + vega * d2vol
+    
+    if strikes.ndim == 0:
+        return tuple(x[()] for x in (vols, v, dist, dens))
+    return vols, v, dist, dens